@@ -0,0 +1,134 @@
+"""
+Micro-batching utilities for model inference.
+Coalesces concurrent requests into a single batched call.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Sequence
+
+
+# Default batching limits
+MAX_BATCH = 64
+MAX_LATENCY_MS = 5
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests and run them as one batch.
+
+    Each call to `submit` enqueues an item and awaits its result. A background
+    task drains the queue, waiting at most `max_latency_ms` after the first
+    item for more to arrive (up to `max_batch_size`), then calls
+    `process_batch` once and fans the results back out. If an executor is
+    set, the batch runs there so CPU-bound inference does not block the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = MAX_BATCH,
+        max_latency_ms: float = MAX_LATENCY_MS,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Args:
+            process_batch: Function mapping a list of items to a list of results
+            max_batch_size: Maximum number of items per batch
+            max_latency_ms: Maximum time to wait for a batch to fill, in milliseconds
+            executor: Executor to run batches in (None runs them on the event loop)
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = max_latency_ms / 1000.0
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Batch currently being processed, so stop() can cancel its waiters
+        self._inflight: list = []
+
+    def start(self):
+        """Start the background batching task on the running event loop."""
+        loop = asyncio.get_running_loop()
+        # A task left on a closed loop (e.g. a per-request test loop) never
+        # finishes, so restart whenever the running loop has changed
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._inflight = []
+            self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background batching task and any requests still waiting on it."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        pending = list(self._inflight)
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._inflight = []
+
+        for _, future in pending:
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Enqueue an item and wait for its result.
+
+        Args:
+            item: Single input to be processed as part of a batch
+
+        Returns:
+            Result for this item
+        """
+        # Start lazily in case the startup hook did not run (e.g. tests)
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """Wait for one item, then gather more until the batch is full or times out."""
+        batch = [await self._queue.get()]
+        self._inflight = batch
+        deadline = asyncio.get_running_loop().time() + self.batch_timeout
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Background loop: collect batches and resolve their futures."""
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+
+            try:
+                if self.executor is not None:
+                    results = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.process_batch, items
+                    )
+                else:
+                    results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -5,20 +5,34 @@ Provides REST API endpoints for prediction and model training.
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import threading
 
-from backend.model import model_exists, load_model, save_model
+import numpy as np
+
+from backend.batching import MicroBatcher, MAX_BATCH, MAX_LATENCY_MS
+from backend.model import model_exists, load_model, save_model, build_predictor
+from backend.native import release_native_predictors
 from backend.train import train_and_save_model
-from backend.vision import estimate_queue_size_from_image
+from backend.vision import (
+    decode_image,
+    estimate_queue_sizes,
+    MAX_IMAGE_BATCH,
+    MAX_IMAGE_LATENCY_MS,
+)
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Wait Time Predictor API",
     description="API for predicting waiting times based on queue size",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Enable CORS for frontend (for local dev and simple deployments).
@@ -27,33 +41,40 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify frontend URL
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists so preflights don't echo back arbitrary methods/headers
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 
 # Pydantic models for request validation
 class PredictionRequest(BaseModel):
     """Request model for prediction endpoint."""
-    queue_size: int = Field(..., gt=0, description="Number of people in queue")
-    avg_service_time: float = Field(..., gt=0, description="Average service time per person in seconds")
-    arrival_rate: Optional[float] = Field(None, gt=0, description="Arrival rate in people per minute (optional)")
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    queue_size: Annotated[int, Field(gt=0, description="Number of people in queue")]
+    avg_service_time: Annotated[float, Field(gt=0, description="Average service time per person in seconds")]
+    arrival_rate: Annotated[Optional[float], Field(gt=0, description="Arrival rate in people per minute (optional)")] = None
 
 
 class PredictionResponse(BaseModel):
     """Response model for prediction endpoint."""
-    predicted_wait_time_seconds: float = Field(..., description="Predicted wait time in seconds")
-    predicted_wait_time_minutes: float = Field(..., description="Predicted wait time in minutes")
+    model_config = ConfigDict(extra="forbid")
+
+    predicted_wait_time_seconds: Annotated[float, Field(description="Predicted wait time in seconds")]
+    predicted_wait_time_minutes: Annotated[float, Field(description="Predicted wait time in minutes")]
     queue_size: int
     avg_service_time: float
     arrival_rate: Optional[float] = None
-    queue_source: Optional[str] = Field(
-        None, description="Where queue_size came from (manual/image)"
-    )
+    queue_source: Annotated[
+        Optional[str], Field(description="Where queue_size came from (manual/image)")
+    ] = None
 
 
 class TrainResponse(BaseModel):
     """Response model for training endpoint."""
+    model_config = ConfigDict(extra="forbid", protected_namespaces=())
+
     status: str
     model_type: Optional[str] = None
     r2_score: Optional[float] = None
@@ -63,41 +84,132 @@ class TrainResponse(BaseModel):
 
 # Global model variable (loaded on startup)
 model = None
+# Prediction function derived from the loaded model
+predict_fn = None
+# Serializes training: runs write the same model files and then install the model
+_train_lock = threading.Lock()
+
+
+def set_model(new_model, model_path: Optional[str] = None):
+    """Install a loaded model and its fast prediction function."""
+    global model, predict_fn
+    # Build first so a failure leaves the previous model and predictor in place
+    new_predict_fn = build_predictor(new_model, model_path) if new_model is not None else None
+    model, predict_fn = new_model, new_predict_fn
+    # Unload native libraries of replaced models
+    release_native_predictors(keep=new_predict_fn)
 
 
 def ensure_model_exists():
     """Ensure a trained model exists, train if it doesn't."""
     global model
     
-    model_path = "models/wait_time_model.joblib"
+    model_path = "models/wait_time_model.pkl"
     
-    if not model_exists(model_path):
-        print("Model not found. Training new model...")
-        result = train_and_save_model(model_type="linear", model_path=model_path)
-        
-        if result["status"] == "error":
-            raise RuntimeError(f"Failed to train model: {result.get('error')}")
+    with _train_lock:
+        if not model_exists(model_path):
+            print("Model not found. Training new model...")
+            result = train_and_save_model(model_type="linear", model_path=model_path)
+            
+            if result["status"] == "error":
+                raise RuntimeError(f"Failed to train model: {result.get('error')}")
+            
+            print(f"Model trained successfully. R² Score: {result['r2_score']:.4f}")
         
-        print(f"Model trained successfully. R² Score: {result['r2_score']:.4f}")
-    
-    # Load the model
-    model = load_model(model_path)
+        # Load the model
+        set_model(load_model(model_path), model_path)
     
     if model is None:
         raise RuntimeError("Failed to load model")
 
 
+def _train_and_install(model_type: str) -> dict:
+    """
+    Train (or reuse) a model and install it, one run at a time.
+
+    Args:
+        model_type: Type of model to train ("linear" or "random_forest")
+
+    Returns:
+        Result dictionary from train_and_save_model
+    """
+    model_path = "models/wait_time_model.pkl"
+
+    with _train_lock:
+        result = train_and_save_model(model_type=model_type, model_path=model_path)
+
+        if result["status"] == "success":
+            # Install the freshly trained model, or load the reused one from disk
+            trained = result["model"]
+            set_model(trained if trained is not None else load_model(model_path), model_path)
+
+    return result
+
+
+# Preallocated input buffer for batched inference (float32, like the training data).
+# Only the batcher's background task writes to it, one batch at a time.
+_SCRATCH = np.empty((MAX_BATCH, 3), dtype=np.float32)
+
+
+def _predict_batch(rows: list) -> list:
+    """
+    Run the model once over a batch of feature rows.
+
+    Args:
+        rows: List of (queue_size, avg_service_time, arrival_rate) tuples
+
+    Returns:
+        List of predicted wait times in seconds, one per row
+    """
+    n = len(rows)
+    for i, (queue_size, avg_service_time, arrival_rate) in enumerate(rows):
+        _SCRATCH[i, 0] = queue_size
+        _SCRATCH[i, 1] = avg_service_time
+        _SCRATCH[i, 2] = arrival_rate
+    return predict_fn(_SCRATCH[:n]).tolist()
+
+
+# Coalesces concurrent /predict calls into a single model.predict
+predict_batcher = MicroBatcher(
+    _predict_batch, max_batch_size=MAX_BATCH, max_latency_ms=MAX_LATENCY_MS
+)
+
+# Coalesces concurrent /predict-image uploads into a single YOLO call
+image_batcher = MicroBatcher(
+    estimate_queue_sizes,
+    max_batch_size=MAX_IMAGE_BATCH,
+    max_latency_ms=MAX_IMAGE_LATENCY_MS,
+)
+
+
 # Startup event: Auto-train model if it doesn't exist
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on application startup."""
+    # Dedicated pool for CPU-bound inference, keeps the event loop free
+    app.state.pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+    predict_batcher.executor = app.state.pool
+    image_batcher.executor = app.state.pool
+
     try:
+        predict_batcher.start()
+        image_batcher.start()
         ensure_model_exists()
         print("Wait Time Predictor API started successfully!")
     except Exception as e:
         print(f"Warning: {e}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks on application shutdown."""
+    await predict_batcher.stop()
+    await image_batcher.stop()
+    pool = getattr(app.state, "pool", None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -115,8 +227,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    model_path = "models/wait_time_model.joblib"
-    model_loaded = model is not None and model_exists(model_path)
+    # The model lives in memory once loaded, so no filesystem check is needed
+    model_loaded = model is not None
     
     return {
         "status": "healthy" if model_loaded else "unhealthy",
@@ -152,11 +264,11 @@ async def predict_wait_time(request: PredictionRequest):
     
     # Prepare features for prediction
     # Features: [queue_size, avg_service_time, arrival_rate]
-    features = [[request.queue_size, request.avg_service_time, arrival_rate]]
+    features = (request.queue_size, request.avg_service_time, arrival_rate)
     
     try:
-        # Make prediction using trained model
-        predicted_seconds = float(model.predict(features)[0])
+        # Make prediction using trained model (batched with concurrent requests)
+        predicted_seconds = float(await predict_batcher.submit(features))
 
         # Ensure non-negative prediction
         predicted_seconds = max(0.0, predicted_seconds)
@@ -208,8 +320,11 @@ async def predict_wait_time_from_image(
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Empty image upload.")
 
-    # Estimate queue size from image
-    queue_size = estimate_queue_size_from_image(image_bytes)
+    # Decode off the event loop, then estimate queue size with concurrent uploads
+    img = await asyncio.get_running_loop().run_in_executor(
+        getattr(app.state, "pool", None), decode_image, image_bytes
+    )
+    queue_size = await image_batcher.submit(img)
     if queue_size <= 0:
         raise HTTPException(
             status_code=422,
@@ -219,9 +334,9 @@ async def predict_wait_time_from_image(
     # Default arrival rate if not provided
     ar = arrival_rate if arrival_rate is not None else 2.0
 
-    features = [[queue_size, float(avg_service_time), float(ar)]]
+    features = (queue_size, float(avg_service_time), float(ar))
     try:
-        predicted_seconds = float(model.predict(features)[0])
+        predicted_seconds = float(await predict_batcher.submit(features))
         predicted_seconds = max(0.0, predicted_seconds)
         predicted_minutes = predicted_seconds / 60.0
 
@@ -257,15 +372,12 @@ async def train_model(model_type: str = "linear"):
         )
     
     try:
-        result = train_and_save_model(
-            model_type=model_type,
-            model_path="models/wait_time_model.joblib"
+        # Training (and native compilation) is slow; keep the event loop free
+        result = await asyncio.get_running_loop().run_in_executor(
+            getattr(app.state, "pool", None), _train_and_install, model_type
         )
         
         if result["status"] == "success":
-            # Reload the model
-            model = load_model("models/wait_time_model.joblib")
-            
             return TrainResponse(
                 status="success",
                 model_type=result["model_type"],
@@ -285,5 +397,16 @@ async def train_model(model_type: str = "linear"):
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # uvloop/httptools are faster than the defaults; uvloop isn't available on Windows.
+    # A single worker keeps one model/YOLO copy and full micro-batches, and avoids
+    # several processes training and writing model files at startup.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+    )
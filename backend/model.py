@@ -1,14 +1,47 @@
 """
 Model persistence module for saving and loading trained models.
-Uses joblib for efficient model serialization.
+Linear models are stored as JSON coefficients; other models use pickle.
 """
 
 import os
-import joblib
-from typing import Optional
+import json
+import pickle
+import numpy as np
+from typing import Callable, Optional
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor
 
+from backend.native import load_native_predictor
 
-def model_exists(model_path: str = "models/wait_time_model.joblib") -> bool:
+
+class LinearModel:
+    """
+    Minimal linear model restored from stored coefficients.
+
+    Exposes the same `coef_`, `intercept_` and `predict` interface as
+    scikit-learn's LinearRegression.
+    """
+
+    def __init__(self, coef, intercept: float):
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = float(intercept)
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X) @ self.coef_ + self.intercept_
+
+
+def _json_path(model_path: str) -> str:
+    """Path of the JSON file used for linear models."""
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def _remove_if_exists(path: str):
+    """Delete a file left over from a previously saved model."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def model_exists(model_path: str = "models/wait_time_model.pkl") -> bool:
     """
     Check if a model file exists at the given path.
     
@@ -16,14 +49,17 @@ def model_exists(model_path: str = "models/wait_time_model.joblib") -> bool:
         model_path: Path to the model file
     
     Returns:
-        True if model exists, False otherwise
+        True if model exists (as pickle or linear JSON), False otherwise
     """
-    return os.path.exists(model_path)
+    return os.path.exists(model_path) or os.path.exists(_json_path(model_path))
 
 
-def save_model(model, model_path: str = "models/wait_time_model.joblib"):
+def save_model(model, model_path: str = "models/wait_time_model.pkl"):
     """
-    Save a trained model to disk using joblib.
+    Save a trained model to disk.
+    
+    Linear models are stored as their coefficients in a small JSON file next
+    to `model_path`; other models are pickled to `model_path`.
     
     Args:
         model: Trained scikit-learn model
@@ -32,11 +68,25 @@ def save_model(model, model_path: str = "models/wait_time_model.joblib"):
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     
-    joblib.dump(model, model_path)
+    if isinstance(model, (LinearRegression, LinearModel)):
+        json_path = _json_path(model_path)
+        with open(json_path, "w") as f:
+            json.dump({
+                "type": "linear",
+                "coef": np.asarray(model.coef_).tolist(),
+                "intercept": float(model.intercept_),
+            }, f)
+        _remove_if_exists(model_path)
+        print(f"Model saved to {json_path}")
+        return
+    
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _remove_if_exists(_json_path(model_path))
     print(f"Model saved to {model_path}")
 
 
-def load_model(model_path: str = "models/wait_time_model.joblib"):
+def load_model(model_path: str = "models/wait_time_model.pkl"):
     """
     Load a trained model from disk.
     
@@ -50,9 +100,97 @@ def load_model(model_path: str = "models/wait_time_model.joblib"):
         return None
     
     try:
-        model = joblib.load(model_path)
+        json_path = _json_path(model_path)
+        if os.path.exists(json_path):
+            with open(json_path) as f:
+                params = json.load(f)
+            model = LinearModel(params["coef"], params["intercept"])
+            print(f"Model loaded from {json_path}")
+            return model
+
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
         print(f"Model loaded from {model_path}")
         return model
     except Exception as e:
         print(f"Error loading model: {e}")
         return None
+
+
+def _build_forest_predictor(model: RandomForestRegressor) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Flatten a fitted random forest into contiguous node arrays.
+
+    All trees are walked together, one level per step, so a prediction costs
+    `max_depth` vectorized numpy operations instead of one Python-dispatched
+    traversal per tree. Leaves point to themselves, which lets every walk run
+    for the same number of steps.
+
+    Args:
+        model: Fitted RandomForestRegressor
+
+    Returns:
+        Function mapping an (n, 3) feature array to n predictions
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left < 0
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        values.append(tree.value[:, 0, 0])
+
+    feature = np.concatenate(features)
+    threshold = np.concatenate(thresholds)
+    left = np.concatenate(lefts)
+    right = np.concatenate(rights)
+    value = np.concatenate(values)
+    roots = offsets.astype(np.intp)
+    depth = max(tree.max_depth for tree in trees)
+
+    def predict(X: np.ndarray) -> np.ndarray:
+        # sklearn trees compare float32 inputs against their thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(roots, (X.shape[0], roots.size))
+        for _ in range(depth):
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return value[nodes].mean(axis=1)
+
+    return predict
+
+
+def build_predictor(model, model_path: Optional[str] = None) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Build a fast prediction function for a loaded model.
+
+    LinearRegression is reduced to a plain dot product over its coefficients,
+    skipping sklearn's per-call input validation. RandomForestRegressor uses
+    the native library compiled at train time when one exists next to
+    `model_path`; otherwise it is flattened into contiguous arrays and
+    evaluated level by level across all trees. Other models fall back to
+    their own predict method.
+
+    Args:
+        model: Trained scikit-learn model
+        model_path: Path the model was loaded from, used to find a compiled library
+
+    Returns:
+        Function mapping an (n, 3) feature array to n predictions
+    """
+    if isinstance(model, (LinearRegression, LinearModel)):
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = float(model.intercept_)
+        return lambda X: X @ coef + intercept
+
+    if isinstance(model, RandomForestRegressor):
+        native = load_native_predictor(model_path) if model_path else None
+        return native if native is not None else _build_forest_predictor(model)
+
+    return model.predict
@@ -0,0 +1,195 @@
+"""
+Native compilation of tree ensembles for fast inference.
+Exports a fitted model to C with m2cgen and loads the shared library via ctypes.
+"""
+
+import ctypes
+import _ctypes
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+def native_lib_path(model_path: str = "models/wait_time_model.pkl") -> str:
+    """Path of the compiled shared library stored next to a model."""
+    return os.path.splitext(model_path)[0] + ".so"
+
+
+def remove_native_model(model_path: str = "models/wait_time_model.pkl"):
+    """Delete a compiled library left over from a previously saved model."""
+    lib_path = native_lib_path(model_path)
+    if os.path.exists(lib_path):
+        os.remove(lib_path)
+
+
+def compile_native_model(model, model_path: str = "models/wait_time_model.pkl") -> Optional[str]:
+    """
+    Compile a fitted model to a shared library next to `model_path`.
+
+    The model is exported to C as a `double score(double *input)` function
+    and built with the system C compiler (`$CC`, default `cc`). Any stale
+    library is removed first, so a failed build never leaves one behind.
+
+    Args:
+        model: Fitted scikit-learn model supported by m2cgen
+        model_path: Path of the saved model
+
+    Returns:
+        Path to the compiled library, or None if the model could not be compiled
+    """
+    remove_native_model(model_path)
+
+    try:
+        import m2cgen
+    except ImportError:
+        print("m2cgen not installed. Skipping native compilation.")
+        return None
+
+    lib_path = native_lib_path(model_path)
+    # Any failure (unsupported estimator, RecursionError on deep ensembles,
+    # missing compiler) leaves the flattened-forest predictor in use
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, "model.c")
+            with open(source_path, "w") as f:
+                f.write(m2cgen.export_to_c(model))
+
+            subprocess.run(
+                # Straight-line branch code gains little from -O2 but builds much slower
+                [os.environ.get("CC", "cc"), "-O1", "-shared", "-fPIC",
+                 "-o", lib_path, source_path],
+                check=True,
+                capture_output=True,
+            )
+    except Exception as e:
+        print(f"Native compilation failed: {e}")
+        remove_native_model(model_path)
+        return None
+
+    print(f"Native model compiled to {lib_path}")
+    return lib_path
+
+
+def _dlclose(lib: ctypes.CDLL):
+    """Unload a library opened with ctypes.CDLL."""
+    dlclose = getattr(_ctypes, "dlclose", None) or getattr(_ctypes, "FreeLibrary", None)
+    if dlclose is not None:
+        dlclose(lib._handle)
+
+
+class NativePredictor:
+    """
+    Prediction function backed by a loaded native model library.
+
+    Calls are serialized with `close()`, so the library is never unloaded
+    while a batch is being scored.
+    """
+
+    def __init__(self, lib: ctypes.CDLL, key: tuple):
+        self.key = key
+        self._lib = lib
+        self._score = lib.score
+        self._score.argtypes = [ctypes.POINTER(ctypes.c_double)]
+        self._score.restype = ctypes.c_double
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __call__(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        double_p = ctypes.POINTER(ctypes.c_double)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Native model was unloaded")
+            return np.array([self._score(row.ctypes.data_as(double_p)) for row in X])
+
+    def close(self):
+        """Unload the library; later calls raise RuntimeError."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._score = None
+            _dlclose(self._lib)
+
+
+# Libraries currently loaded, reused while the file on disk is unchanged
+_open_predictors: List[NativePredictor] = []
+_open_lock = threading.Lock()
+
+
+def release_native_predictors(keep: Optional[Callable] = None):
+    """
+    Unload every native library except the one backing `keep`.
+
+    Call after installing a new prediction function so replaced models
+    don't keep their library copies mapped.
+
+    Args:
+        keep: Prediction function that is still in use
+    """
+    with _open_lock:
+        for predictor in list(_open_predictors):
+            if predictor is not keep:
+                predictor.close()
+                _open_predictors.remove(predictor)
+
+
+def load_native_predictor(model_path: str = "models/wait_time_model.pkl") -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """
+    Load a compiled model library as a prediction function.
+
+    A library that is already loaded and unchanged on disk is reused.
+
+    Args:
+        model_path: Path of the saved model
+
+    Returns:
+        Function mapping an (n, 3) feature array to n predictions,
+        or None if no usable library exists
+    """
+    lib_path = native_lib_path(model_path)
+    if not os.path.exists(lib_path):
+        return None
+
+    # A library older than the saved model belongs to a previous model
+    if os.path.exists(model_path) and os.path.getmtime(lib_path) < os.path.getmtime(model_path):
+        return None
+
+    stat = os.stat(lib_path)
+    key = (os.path.abspath(lib_path), stat.st_mtime_ns, stat.st_size)
+
+    with _open_lock:
+        for predictor in _open_predictors:
+            if predictor.key == key:
+                return predictor
+
+        # dlopen returns the already-loaded library for a path it has seen, so a
+        # retrained model is loaded from a fresh copy. The mapping stays valid
+        # after the copy is unlinked.
+        fd, load_path = tempfile.mkstemp(suffix=".so")
+        os.close(fd)
+        try:
+            shutil.copyfile(lib_path, load_path)
+            lib = ctypes.CDLL(load_path)
+        except OSError as e:
+            print(f"Error loading native model: {e}")
+            return None
+        finally:
+            os.remove(load_path)
+
+        try:
+            predictor = NativePredictor(lib, key)
+        except AttributeError as e:
+            print(f"Error loading native model: {e}")
+            _dlclose(lib)
+            return None
+
+        _open_predictors.append(predictor)
+
+    print(f"Native model loaded from {lib_path}")
+    return predictor
@@ -28,51 +28,46 @@ def generate_queue_data(
     Returns:
         DataFrame with columns: queue_size, avg_service_time, arrival_rate, waiting_time
     """
-    np.random.seed(42)  # For reproducibility
+    rng = np.random.default_rng(42)  # For reproducibility
     
-    data = []
+    # Random queue sizes between min and max
+    queue_size = rng.integers(min_queue_size, max_queue_size + 1, num_samples)
     
-    for _ in range(num_samples):
-        # Random queue size between min and max
-        queue_size = np.random.randint(min_queue_size, max_queue_size + 1)
-        
-        # Random average service time (between 30 seconds and 5 minutes)
-        avg_service_time = np.random.uniform(30, 300)
-        
-        # Random arrival rate (between 0.5 and 10 people per minute)
-        arrival_rate = np.random.uniform(0.5, 10.0)
-        
-        # Base waiting time: queue_size * avg_service_time
-        # This represents the time to serve all people currently in queue
-        base_wait_time = queue_size * avg_service_time
-        
-        # Add realistic noise (variance increases with queue size)
-        noise = np.random.normal(0, base_wait_time * noise_level)
-        waiting_time = max(0, base_wait_time + noise)  # Ensure non-negative
-        
-        data.append({
-            'queue_size': queue_size,
-            'avg_service_time': avg_service_time,
-            'arrival_rate': arrival_rate,
-            'waiting_time': waiting_time
-        })
+    # Random average service times (between 30 seconds and 5 minutes)
+    avg_service_time = rng.uniform(30, 300, num_samples)
     
-    df = pd.DataFrame(data)
+    # Random arrival rates (between 0.5 and 10 people per minute)
+    arrival_rate = rng.uniform(0.5, 10.0, num_samples)
+    
+    # Base waiting time: queue_size * avg_service_time
+    # This represents the time to serve all people currently in queue
+    base_wait_time = queue_size * avg_service_time
+    
+    # Add realistic noise (variance increases with queue size)
+    noise = rng.normal(0, base_wait_time * noise_level)
+    waiting_time = np.maximum(0, base_wait_time + noise)  # Ensure non-negative
+    
+    df = pd.DataFrame({
+        'queue_size': queue_size,
+        'avg_service_time': avg_service_time,
+        'arrival_rate': arrival_rate,
+        'waiting_time': waiting_time
+    })
     return df
 
 
-def save_queue_data(df: pd.DataFrame, filepath: str = "data/queue_data.csv"):
+def save_queue_data(df: pd.DataFrame, filepath: str = "data/queue_data.parquet"):
     """
-    Save generated queue data to CSV file.
+    Save generated queue data to a Parquet file.
     
     Args:
         df: DataFrame containing queue data
-        filepath: Path to save the CSV file
+        filepath: Path to save the Parquet file
     """
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
     
-    df.to_csv(filepath, index=False)
+    df.to_parquet(filepath, index=False, compression="zstd")
     print(f"Queue data saved to {filepath}")
 
 
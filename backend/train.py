@@ -5,42 +5,141 @@ Trains regression models on synthetic queue data.
 
 import pandas as pd
 import numpy as np
+import hashlib
+import json
+import sklearn
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score, mean_squared_error
 import os
+from typing import Optional
 
 from backend.simulation import generate_queue_data, save_queue_data
-from backend.model import save_model
+from backend.model import save_model, model_exists
+from backend.native import compile_native_model, remove_native_model
 
 
-def load_or_generate_data(data_path: str = "data/queue_data.csv") -> pd.DataFrame:
+# Column dtypes for legacy queue data CSVs
+QUEUE_DATA_DTYPES = {
+    'queue_size': np.int32,
+    'avg_service_time': np.float32,
+    'arrival_rate': np.float32,
+    'waiting_time': np.float32,
+}
+
+
+# Random Forest hyperparameters
+RANDOM_FOREST_PARAMS = {'n_estimators': 100, 'random_state': 42, 'max_depth': 10}
+
+# Bump when training code changes in a way that should invalidate saved models
+TRAINING_VERSION = 2
+
+# Everything besides the data that determines a trained model
+TRAINING_CONFIG = {
+    'version': TRAINING_VERSION,
+    'sklearn': sklearn.__version__,
+    'feature_dtype': 'float32',
+    'random_forest': RANDOM_FOREST_PARAMS,
+}
+
+
+def find_data_file(data_path: str = "data/queue_data.parquet") -> Optional[str]:
+    """
+    Locate the data file that training would read.
+    
+    Args:
+        data_path: Path to the data file
+    
+    Returns:
+        Path to the existing Parquet (or legacy CSV) file, or None if neither exists
     """
-    Load queue data from CSV or generate if it doesn't exist.
+    stem = os.path.splitext(data_path)[0]
+    parquet_path = stem + ".parquet"
+    csv_path = stem + ".csv"
+    
+    if os.path.exists(parquet_path):
+        return parquet_path
+    if os.path.exists(csv_path):
+        return csv_path
+    return None
+
+
+def load_or_generate_data(data_path: str = "data/queue_data.parquet") -> pd.DataFrame:
+    """
+    Load queue data from Parquet (or a legacy CSV) or generate if it doesn't exist.
     
     Args:
-        data_path: Path to the CSV file
+        data_path: Path to the data file
     
     Returns:
         DataFrame with queue data
     """
-    if os.path.exists(data_path):
-        print(f"Loading data from {data_path}")
-        return pd.DataFrame(pd.read_csv(data_path))
+    data_file = find_data_file(data_path)
+    
+    if data_file is not None and data_file.endswith(".parquet"):
+        print(f"Loading data from {data_file}")
+        return pd.read_parquet(data_file)
+    elif data_file is not None:
+        print(f"Loading data from {data_file}")
+        return pd.read_csv(data_file, dtype=QUEUE_DATA_DTYPES, engine='c')
     else:
         print(f"Data file not found. Generating new data...")
         data = generate_queue_data()
-        save_queue_data(data, data_path)
+        save_queue_data(data, os.path.splitext(data_path)[0] + ".parquet")
         return data
 
 
-def train_linear_model(data_path: str = "data/queue_data.csv") -> tuple:
+def _file_sha256(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _meta_path(model_path: str) -> str:
+    """Path of the sidecar file recording what a saved model was trained on."""
+    return os.path.splitext(model_path)[0] + ".meta.json"
+
+
+def _load_cached_metrics(model_type: str, data_sha: str, model_path: str) -> Optional[dict]:
+    """
+    Return stored metrics if the saved model was trained on the same data
+    with the same training configuration.
+    
+    Args:
+        model_type: Requested model type
+        data_sha: SHA-256 of the current data file
+        model_path: Path of the saved model
+    
+    Returns:
+        Metadata dictionary on a match, otherwise None
+    """
+    meta_path = _meta_path(model_path)
+    if not (model_exists(model_path) and os.path.exists(meta_path)):
+        return None
+    
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if (meta.get("sha") != data_sha
+            or meta.get("model_type") != model_type
+            or meta.get("config") != TRAINING_CONFIG):
+        return None
+    return meta
+
+
+def train_linear_model(data_path: str = "data/queue_data.parquet") -> tuple:
     """
     Train a Linear Regression model on queue data.
     
     Args:
-        data_path: Path to the training data CSV
+        data_path: Path to the training data file
     
     Returns:
         Tuple of (trained_model, r2_score, mse)
@@ -50,8 +149,8 @@ def train_linear_model(data_path: str = "data/queue_data.csv") -> tuple:
     
     # Prepare features and target
     # Features: queue_size, avg_service_time, arrival_rate
-    X = df[['queue_size', 'avg_service_time', 'arrival_rate']].values
-    y = df['waiting_time'].values
+    X = df[['queue_size', 'avg_service_time', 'arrival_rate']].to_numpy(dtype=np.float32)
+    y = df['waiting_time'].to_numpy(dtype=np.float32)
     
     # Split data (80% train, 20% test)
     X_train, X_test, y_train, y_test = train_test_split(
@@ -72,12 +171,12 @@ def train_linear_model(data_path: str = "data/queue_data.csv") -> tuple:
     return model, r2, mse
 
 
-def train_random_forest_model(data_path: str = "data/queue_data.csv") -> tuple:
+def train_random_forest_model(data_path: str = "data/queue_data.parquet") -> tuple:
     """
     Train a Random Forest Regression model on queue data.
     
     Args:
-        data_path: Path to the training data CSV
+        data_path: Path to the training data file
     
     Returns:
         Tuple of (trained_model, r2_score, mse)
@@ -86,8 +185,8 @@ def train_random_forest_model(data_path: str = "data/queue_data.csv") -> tuple:
     df = load_or_generate_data(data_path)
     
     # Prepare features and target
-    X = df[['queue_size', 'avg_service_time', 'arrival_rate']].values
-    y = df['waiting_time'].values
+    X = df[['queue_size', 'avg_service_time', 'arrival_rate']].to_numpy(dtype=np.float32)
+    y = df['waiting_time'].to_numpy(dtype=np.float32)
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
@@ -95,7 +194,7 @@ def train_random_forest_model(data_path: str = "data/queue_data.csv") -> tuple:
     )
     
     # Train Random Forest model
-    model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
+    model = RandomForestRegressor(**RANDOM_FOREST_PARAMS)
     model.fit(X_train, y_train)
     
     # Evaluate model
@@ -110,8 +209,8 @@ def train_random_forest_model(data_path: str = "data/queue_data.csv") -> tuple:
 
 def train_and_save_model(
     model_type: str = "linear",
-    data_path: str = "data/queue_data.csv",
-    model_path: str = "models/wait_time_model.joblib"
+    data_path: str = "data/queue_data.parquet",
+    model_path: str = "models/wait_time_model.pkl"
 ) -> dict:
     """
     Train a model and save it to disk.
@@ -122,9 +221,25 @@ def train_and_save_model(
         model_path: Path to save the trained model
     
     Returns:
-        Dictionary with model, metrics, and status
+        Dictionary with model, metrics, and status. "model" is None when the
+        saved model was reused, since it is left on disk unloaded.
     """
     try:
+        # Skip retraining when the data and model type are unchanged
+        data_file = find_data_file(data_path)
+        if data_file is not None:
+            data_sha = _file_sha256(data_file)
+            meta = _load_cached_metrics(model_type, data_sha, model_path)
+            if meta is not None:
+                print("Training data and config unchanged. Using saved model.")
+                return {
+                    "status": "success",
+                    "model_type": model_type,
+                    "r2_score": float(meta["r2"]),
+                    "mse": float(meta["mse"]),
+                    "model": None
+                }
+        
         if model_type == "linear":
             model, r2, mse = train_linear_model(data_path)
         elif model_type == "random_forest":
@@ -132,9 +247,30 @@ def train_and_save_model(
         else:
             raise ValueError(f"Unknown model type: {model_type}")
         
+        # Drop the old meta first so it can never describe a half-replaced model
+        meta_path = _meta_path(model_path)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        
         # Save model
         save_model(model, model_path)
         
+        # Compile tree ensembles to native code for fast inference
+        if model_type == "random_forest":
+            compile_native_model(model, model_path)
+        else:
+            remove_native_model(model_path)
+        
+        # Record what the model was trained on (data may have just been generated)
+        with open(meta_path, "w") as f:
+            json.dump({
+                "sha": _file_sha256(find_data_file(data_path)),
+                "model_type": model_type,
+                "config": TRAINING_CONFIG,
+                "r2": float(r2),
+                "mse": float(mse),
+            }, f)
+        
         return {
             "status": "success",
             "model_type": model_type,